@@ -10,10 +10,17 @@ include:
 * calculate_average_check() – Compute the average value of a sale.
 * get_top_products() – Rank products by total revenue and return the
   top N.
-* forecast_sales() – Provide a naive forecast of future revenue based
-  on recent history.
+* get_report_bundle() – Run the three queries above together for the
+  report.
+* forecast_sales() – Forecast next-day revenue by simple exponential
+  smoothing of the daily totals.
 
-These functions rely on `data.get_connection()` to access the database.
+Daily and per-product revenue are read from the summary tables that
+`data.insert_sales()` maintains, so reports do not re-aggregate the
+full `sales` table.
+
+These functions rely on `data.borrow()` to borrow a pooled read
+connection for the duration of each query.
 """
 
 from __future__ import annotations
@@ -22,7 +29,51 @@ import sqlite3
 from typing import List, Tuple, Optional
 from datetime import datetime, timedelta
 
-from .data import get_connection
+from .data import borrow
+
+
+def _daily_sales(cursor: sqlite3.Cursor, days: int) -> List[Tuple[str, float]]:
+    """Query behind calculate_daily_sales(), run on the given cursor."""
+    # Compute the cutoff date. We use >= cutoff to include today and
+    # the previous (days-1) days. SQLite uses text comparison for
+    # dates stored as TEXT in ISO format.
+    cutoff_date = (datetime.now().date() - timedelta(days=days - 1)).isoformat()
+    cursor.execute(
+        """
+        SELECT date, total
+        FROM daily_sales_mv
+        WHERE date >= ?
+        ORDER BY date ASC
+        """,
+        (cutoff_date,),
+    )
+    rows = cursor.fetchall()
+    return [(row[0], float(row[1])) for row in rows]
+
+
+def _average_check(cursor: sqlite3.Cursor) -> float:
+    """Query behind calculate_average_check(), run on the given cursor."""
+    cursor.execute(
+        "SELECT AVG(amount) FROM sales"
+    )
+    result = cursor.fetchone()
+    avg_value = result[0] if result and result[0] is not None else 0.0
+    return float(avg_value)
+
+
+def _top_products(cursor: sqlite3.Cursor, limit: int) -> List[Tuple[str, float]]:
+    """Query behind get_top_products(), run on the given cursor."""
+    cursor.execute(
+        """
+        SELECT product, total
+        FROM product_totals_mv
+        ORDER BY total DESC
+        LIMIT ?
+        """,
+        (limit,),
+    )
+    rows = cursor.fetchall()
+    return [(row[0], float(row[1])) for row in rows]
 
 
 def calculate_daily_sales(days: int = 7) -> List[Tuple[str, float]]:
@@ -33,27 +84,8 @@ def calculate_daily_sales(days: int = 7) -> List[Tuple[str, float]]:
     :return: List of (date, total) tuples ordered chronologically (oldest
              to newest). Dates are formatted as YYYY-MM-DD strings.
     """
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        # Compute the cutoff date. We use >= cutoff to include today and
-        # the previous (days-1) days. SQLite uses text comparison for
-        # dates stored as TEXT in ISO format.
-        cutoff_date = (datetime.now().date() - timedelta(days=days - 1)).isoformat()
-        cursor.execute(
-            """
-            SELECT date, SUM(amount) as total
-            FROM sales
-            WHERE date >= ?
-            GROUP BY date
-            ORDER BY date ASC
-            """,
-            (cutoff_date,),
-        )
-        rows = cursor.fetchall()
-        return [(row[0], float(row[1])) for row in rows]
-    finally:
-        conn.close()
+    with borrow() as conn:
+        return _daily_sales(conn.cursor(), days)
 
 
 def calculate_average_check() -> float:
@@ -62,17 +94,8 @@ def calculate_average_check() -> float:
 
     :return: The average amount per sale. Returns 0.0 if no sales.
     """
-    conn = get_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT AVG(amount) FROM sales"
-        )
-        result = cursor.fetchone()
-        avg_value = result[0] if result and result[0] is not None else 0.0
-        return float(avg_value)
-    finally:
-        conn.close()
+    with borrow() as conn:
+        return _average_check(conn.cursor())
 
 
 def get_top_products(limit: int = 3) -> List[Tuple[str, float]]:
@@ -83,47 +106,73 @@ def get_top_products(limit: int = 3) -> List[Tuple[str, float]]:
     :return: List of (product, total_revenue) tuples ordered by revenue
              descending
     """
-    conn = get_connection()
-    try:
+    with borrow() as conn:
+        return _top_products(conn.cursor(), limit)
+
+
+def get_report_bundle(
+    days: int = 7, top_n: int = 3
+) -> Tuple[List[Tuple[str, float]], float, List[Tuple[str, float]]]:
+    """
+    Fetch everything the report needs in one go.
+
+    The three report queries run back-to-back on a single borrowed
+    connection and cursor. They share one read transaction, so all three
+    see the same snapshot even if an upload commits in between.
+
+    :param days: Number of recent days of daily revenue to include
+    :param top_n: Number of top products to include
+    :return: Tuple of (daily sales, average check, top products) as
+             returned by calculate_daily_sales(), calculate_average_check()
+             and get_top_products()
+    """
+    with borrow() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT product, SUM(amount) as total
-            FROM sales
-            GROUP BY product
-            ORDER BY total DESC
-            LIMIT ?
-            """,
-            (limit,),
-        )
-        rows = cursor.fetchall()
-        return [(row[0], float(row[1])) for row in rows]
-    finally:
-        conn.close()
+        cursor.execute("BEGIN")
+        try:
+            return (
+                _daily_sales(cursor, days),
+                _average_check(cursor),
+                _top_products(cursor, top_n),
+            )
+        finally:
+            cursor.execute("COMMIT")
 
 
 def forecast_sales(days: int = 1) -> Optional[float]:
     """
-    Provide a naive forecast for total revenue on the next day.
+    Provide a forecast for total revenue on the next day.
 
-    The forecast is computed as the average daily revenue over the last
-    7 days. If fewer than 3 days of data are available, the function
-    returns None to indicate insufficient history.
+    The forecast is the exponentially smoothed daily revenue maintained
+    by `data.insert_sales()` in the `forecast_state` table, taken as of
+    the most recent day. If fewer than 3 of the last 7 days have data,
+    the function returns None to indicate insufficient history.
 
     :param days: Number of days ahead to forecast (currently only 1 is
                  supported; additional values return the same forecast
                  repeated).
     :return: Forecasted total revenue or None if insufficient data.
     """
-    # Get revenue for the last 7 days
-    daily_sales = calculate_daily_sales(days=7)
-    if len(daily_sales) < 3:
+    cutoff_date = (datetime.now().date() - timedelta(days=6)).isoformat()
+    with borrow() as conn:
+        cursor = conn.cursor()
+        # The history check and the level lookup are one statement, so
+        # the result is a single value (NULL when history is too short)
+        # read from one snapshot.
+        cursor.execute(
+            """
+            SELECT CASE
+                WHEN (SELECT COUNT(*) FROM daily_sales_mv WHERE date >= ?) >= 3
+                THEN (SELECT level FROM forecast_state ORDER BY date DESC LIMIT 1)
+            END
+            """,
+            (cutoff_date,),
+        )
+        level = cursor.fetchone()[0]
+    if level is None:
         # Not enough data to make a reasonable forecast
         return None
-
-    # Compute average of the totals
-    totals = [total for _, total in daily_sales]
-    avg_daily = sum(totals) / len(totals)
     # For now we return only a single forecast value. If days>1, one
-    # could extend this by returning a list or repeating the mean.
-    return float(avg_daily)
\ No newline at end of file
+    # could extend this by repeating the level, which is flat for
+    # simple exponential smoothing.
+    return float(level)
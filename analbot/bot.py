@@ -8,28 +8,32 @@ incoming messages and commands. The bot expects the following commands:
 * `/help` – display help text describing available commands.
 * `/upload` – instruct the user to send a CSV file containing sales data.
 * `/report` – compute and return basic analytics over the uploaded data.
-* `/forecast` – provide a naive forecast of future sales.
+* `/forecast` – provide a simple forecast of future sales.
 
-Incoming CSV files are parsed using pandas and stored in a SQLite
-database via functions defined in the `data` module. The `analytics`
+Incoming CSV files are parsed and stored in a SQLite database via
+functions defined in the `data` module. The `analytics`
 module contains the calculation logic for summarising and forecasting.
 """
 
 import os
-import io
 import logging
+import tempfile
+import threading
 from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 
+import requests
 import telebot
-import pandas as pd
-
-from .data import init_db, insert_sales
-from .analytics import (
-    calculate_daily_sales,
-    calculate_average_check,
-    get_top_products,
-    forecast_sales,
+
+from .data import (
+    init_db,
+    insert_sales_file,
+    insert_sales_stream,
+    csv_extension_available,
+    data_version,
+    MissingColumnsError,
 )
+from .analytics import get_report_bundle, forecast_sales
 
 # Configure basic logging. This will print messages to stdout when running
 # the bot, which can be helpful for debugging.
@@ -46,6 +50,18 @@ if BOT_TOKEN == "YOUR_TELEGRAM_BOT_TOKEN":
         "Bot token not configured. Set the TELEGRAM_TOKEN environment variable"
     )
 
+# Timeout in seconds for connecting to and reading from the Telegram
+# file server, and the block size used when saving a download to disk.
+DOWNLOAD_TIMEOUT = 30
+DOWNLOAD_BLOCK_SIZE = 1 << 16
+
+# Rendered replies for /report and /forecast. The data only changes on
+# upload, so a reply is reused for as long as its stamp - the data
+# version plus today's date, which sets the reporting window - matches.
+_REPORT_CACHE = {"stamp": None, "text": None}
+_FORECAST_CACHE = {"stamp": None, "text": None}
+_CACHE_LOCK = threading.Lock()
+
 # Initialise database (creates tables if they do not exist).
 init_db()
 
@@ -53,6 +69,57 @@ init_db()
 bot = telebot.TeleBot(BOT_TOKEN)
 
 
+def _file_url(file_path: str) -> str:
+    """Return the download URL of a Telegram file, as telebot builds it."""
+    if telebot.apihelper.FILE_URL is None:
+        return f"https://api.telegram.org/file/bot{BOT_TOKEN}/{file_path}"
+    return telebot.apihelper.FILE_URL.format(BOT_TOKEN, file_path)
+
+
+def _cache_stamp() -> tuple:
+    """Return the key under which cached replies are valid."""
+    return (data_version(), datetime.now().date())
+
+
+def _cached_text(cache: dict, stamp: tuple) -> Optional[str]:
+    """Return the cached text if it was stored under `stamp`."""
+    with _CACHE_LOCK:
+        return cache["text"] if cache["stamp"] == stamp else None
+
+
+def _store_text(cache: dict, stamp: tuple, text: str) -> None:
+    """Remember `text` as the reply for `stamp`."""
+    with _CACHE_LOCK:
+        cache["stamp"] = stamp
+        cache["text"] = text
+
+
+# Formats a monetary value for display, e.g. "1,234.50 ₽".
+_format_money = "{:,.2f} ₽".format
+
+
+def _render_report(
+    daily_sales: List[Tuple[str, float]],
+    avg_check: float,
+    top_products: List[Tuple[str, float]],
+) -> str:
+    """Render the /report Markdown text from the analytics results."""
+    sales_text = "\n".join(
+        f"{date}: {_format_money(total)}" for date, total in daily_sales
+    )
+    top_text = "\n".join(
+        f"{idx}. {prod} — {_format_money(total)}"
+        for idx, (prod, total) in enumerate(top_products, start=1)
+    )
+    return (
+        "*Ежедневная выручка (последние 7 дней):*\n"
+        f"{sales_text}\n\n"
+        f"*Средний чек:* {_format_money(avg_check)}\n\n"
+        "*Топ‑3 товара:*\n"
+        f"{top_text}"
+    )
+
+
 @bot.message_handler(commands=["start", "help"])
 def handle_start_help(message: telebot.types.Message) -> None:
     """Send a welcome/help message to the user."""
@@ -101,30 +168,55 @@ def handle_document(message: telebot.types.Message) -> None:
         return
 
     try:
-        # Download file content
-        downloaded_file = bot.download_file(file_info.file_path)
-        # Wrap bytes into BytesIO for pandas
-        data_stream = io.BytesIO(downloaded_file)
-        df = pd.read_csv(data_stream)
-
-        # Validate required columns
-        expected_columns = {"date", "product", "quantity", "amount"}
-        if not expected_columns.issubset({c.lower() for c in df.columns}):
-            bot.reply_to(
-                message,
-                "Неверный формат файла. Ожидаются столбцы: date, product, quantity, amount.",
-            )
-            return
-
-        # Normalise column names to lowercase
-        df.columns = [c.lower() for c in df.columns]
-
-        # Insert into DB
-        rows_inserted = insert_sales(df)
+        # Stream the download rather than buffering the whole file
+        with requests.get(
+            _file_url(file_info.file_path),
+            stream=True,
+            proxies=telebot.apihelper.proxy,
+            timeout=DOWNLOAD_TIMEOUT,
+        ) as response:
+            response.raise_for_status()
+            if csv_extension_available():
+                # SQLite imports the file itself, so it must be on disk
+                tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+                try:
+                    with tmp:
+                        for block in response.iter_content(chunk_size=DOWNLOAD_BLOCK_SIZE):
+                            tmp.write(block)
+                    rows_inserted = insert_sales_file(tmp.name)
+                finally:
+                    os.unlink(tmp.name)
+            else:
+                # Parse straight off the socket; batches are inserted
+                # while the rest of the file is still downloading.
+                response.raw.decode_content = True
+                # Keep the stream open at EOF for the text reader on top
+                response.raw.auto_close = False
+                rows_inserted = insert_sales_stream(response.raw)
         bot.reply_to(
             message,
             f"Файл успешно загружен и сохранён. Количество записей: {rows_inserted}.",
         )
+    except MissingColumnsError:
+        bot.reply_to(
+            message,
+            "Неверный формат файла. Ожидаются столбцы: date, product, quantity, amount.",
+        )
+    except requests.RequestException as exc:
+        # The file URL contains the bot token and requests includes it in
+        # its error messages and tracebacks, so log only the status code
+        # and the file's path on Telegram's side.
+        status = exc.response.status_code if exc.response is not None else None
+        logger.error(
+            "Failed to download uploaded file %s: %s (status %s)",
+            file_info.file_path,
+            type(exc).__name__,
+            status,
+        )
+        bot.reply_to(
+            message,
+            "Не удалось скачать файл из Telegram. Повторите попытку позже.",
+        )
     except Exception as exc:
         logger.exception("Error processing uploaded file", exc_info=exc)
         bot.reply_to(
@@ -141,32 +233,19 @@ def handle_report(message: telebot.types.Message) -> None:
     check value and the top three products.
     """
     try:
-        daily_sales = calculate_daily_sales(days=7)
-        avg_check = calculate_average_check()
-        top_products = get_top_products(limit=3)
-
-        if not daily_sales:
-            bot.reply_to(message, "В базе нет данных. Сначала загрузите файл с данными.")
-            return
-
-        # Format daily sales lines
-        sales_lines = [
-            f"{date}: {total:,.2f} ₽" for date, total in daily_sales
-        ]
-        sales_text = "\n".join(sales_lines)
-        # Format top products
-        top_lines = [
-            f"{idx + 1}. {prod} — {total:,.2f} ₽" for idx, (prod, total) in enumerate(top_products)
-        ]
-        top_text = "\n".join(top_lines)
-
-        report_text = (
-            "*Ежедневная выручка (последние 7 дней):*\n"
-            f"{sales_text}\n\n"
-            f"*Средний чек:* {avg_check:,.2f} ₽\n\n"
-            "*Топ‑3 товара:*\n"
-            f"{top_text}"
-        )
+        # Read the stamp before querying so that a concurrent upload can
+        # only make the stored entry look stale, never fresh.
+        stamp = _cache_stamp()
+        report_text = _cached_text(_REPORT_CACHE, stamp)
+        if report_text is None:
+            daily_sales, avg_check, top_products = get_report_bundle(days=7, top_n=3)
+
+            if not daily_sales:
+                bot.reply_to(message, "В базе нет данных. Сначала загрузите файл с данными.")
+                return
+
+            report_text = _render_report(daily_sales, avg_check, top_products)
+            _store_text(_REPORT_CACHE, stamp, report_text)
         bot.reply_to(message, report_text, parse_mode="Markdown")
     except Exception as exc:
         logger.exception("Error generating report", exc_info=exc)
@@ -179,24 +258,26 @@ def handle_report(message: telebot.types.Message) -> None:
 @bot.message_handler(commands=["forecast"])
 def handle_forecast(message: telebot.types.Message) -> None:
     """
-    Provide a simple forecast for the next day using naive averaging. It
-    uses the last 7 days of sales to compute the expected value for
-    tomorrow. If insufficient data is available, a message is returned.
+    Provide a simple forecast for the next day using exponential
+    smoothing of the daily revenue, weighting recent days most. If
+    insufficient data is available, a message is returned.
     """
     try:
-        forecast_value = forecast_sales(days=1)
-        if forecast_value is None:
-            bot.reply_to(
-                message,
-                "Недостаточно данных для прогноза. Нужно минимум 3 дня исторических данных.",
-            )
-            return
-
-        tomorrow = datetime.now().date() + timedelta(days=1)
-        bot.reply_to(
-            message,
-            f"Прогноз выручки на {tomorrow.strftime('%d.%m.%Y')}: {forecast_value:,.2f} ₽",
-        )
+        stamp = _cache_stamp()
+        forecast_text = _cached_text(_FORECAST_CACHE, stamp)
+        if forecast_text is None:
+            forecast_value = forecast_sales(days=1)
+            if forecast_value is None:
+                forecast_text = (
+                    "Недостаточно данных для прогноза. Нужно минимум 3 дня исторических данных."
+                )
+            else:
+                tomorrow = datetime.now().date() + timedelta(days=1)
+                forecast_text = (
+                    f"Прогноз выручки на {tomorrow.strftime('%d.%m.%Y')}: {_format_money(forecast_value)}"
+                )
+            _store_text(_FORECAST_CACHE, stamp, forecast_text)
+        bot.reply_to(message, forecast_text)
     except Exception as exc:
         logger.exception("Error generating forecast", exc_info=exc)
         bot.reply_to(
@@ -210,7 +291,10 @@ def main() -> None:
     logger.info("Starting bot in polling mode...")
     # Polling ensures the script stays alive and continuously polls
     # Telegram for new messages. Use webhook for production if desired.
-    bot.infinity_polling()
+    # Hold each long-polling request open for up to 30 seconds rather
+    # than telebot's default of 20, and drop updates that queued up while
+    # the bot was down instead of replaying them at start.
+    bot.infinity_polling(timeout=30, long_polling_timeout=30, skip_pending=True)
 
 
 if __name__ == "__main__":
@@ -14,15 +14,49 @@ The table schema for `sales` is defined as follows:
     product  TEXT
     quantity INTEGER
     amount   REAL    (monetary value of the sale)
+    seq      INTEGER (occurrence of an identical row within its upload)
+
+(date, product, quantity, amount, seq) is unique, so uploading the same
+file twice stores its rows only once, while identical sales repeated
+within one file are all kept.
 
 When new sales data is uploaded, each CSV row should include these
-columns. The insert_sales() function normalises and persists the
-records.
+columns. insert_sales_file() imports an uploaded CSV file, through
+SQLite's csv extension when available and insert_sales_stream()
+otherwise; insert_sales() does the same for a DataFrame.
+
+SQLite has no materialized views, so the aggregates the analytics layer
+reads on every report are kept in summary tables that insert_sales()
+updates alongside `sales`:
+
+    daily_sales_mv    date TEXT PRIMARY KEY, total REAL
+    product_totals_mv product TEXT PRIMARY KEY, total REAL
+
+The forecast state is kept the same way: `forecast_state` stores, for
+each day in daily_sales_mv, the exponentially smoothed revenue level
+after that day,
+
+    level_t = alpha * total_t + (1 - alpha) * level_(t-1)
+
+so the next-day forecast is a single-row lookup.
+
+refresh_materialized_views() rebuilds all of them from `sales` should
+they ever drift (e.g. after rows are edited by hand).
 """
 
+import csv
+import io
 import os
 import sqlite3
-from typing import Iterable, Tuple, List
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import BinaryIO, Dict, Iterable, Iterator, Tuple, Optional
 
 import pandas as pd
 
@@ -32,6 +66,17 @@ import pandas as pd
 DB_PATH = os.getenv("ANALBOT_DB_PATH", os.path.join("db", "database.db"))
 
 
+# Columns every sales upload must provide, in insertion order.
+SALES_COLUMNS = ("date", "product", "quantity", "amount")
+
+# Number of uploaded rows inserted per transaction.
+BATCH_SIZE = 50_000
+
+
+class MissingColumnsError(ValueError):
+    """Raised when sales data lacks one of the required columns."""
+
+
 def _ensure_db_dir() -> None:
     """Ensure that the directory for the database exists."""
     db_dir = os.path.dirname(DB_PATH)
@@ -39,23 +84,174 @@ def _ensure_db_dir() -> None:
         os.makedirs(db_dir, exist_ok=True)
 
 
-def get_connection() -> sqlite3.Connection:
-    """Return a new connection to the SQLite database.
+# Smoothing factor for the forecast level. Higher values follow recent
+# days more closely; lower values smooth out day-to-day noise.
+SMOOTHING_ALPHA = 0.3
+
+# Pragmas applied to every pooled connection when it is opened. WAL
+# lets readers proceed while a write is in progress, NORMAL synchronous
+# mode is durable under WAL without an fsync on every commit, and the
+# larger page cache (64 MB) and memory map keep hot pages around between
+# requests. analysis_limit makes ANALYZE sample each index instead of
+# reading it in full, so it stays cheap after every upload.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA analysis_limit=1000",
+)
+
+# Total number of pooled connections. WAL allows a single writer at a
+# time, so one connection is reserved for writes and the rest serve
+# reads concurrently.
+POOL_SIZE = 4
+
+# The pools are created lazily on first use; `_POOL_LOCK` guards their
+# creation and teardown.
+_WRITER: Optional["queue.Queue[sqlite3.Connection]"] = None
+_READERS: Optional["queue.Queue[sqlite3.Connection]"] = None
+_POOL_LOCK = threading.Lock()
+
+# Name or path of SQLite's `csv` virtual table extension. When it can
+# be loaded, uploaded files are imported by SQLite directly; otherwise
+# they are parsed in Python. Override via ANALBOT_SQLITE_CSV_EXTENSION.
+CSV_EXTENSION = os.getenv("ANALBOT_SQLITE_CSV_EXTENSION", "csv")
+
+# Largest file, in bytes, imported through the csv virtual table. That
+# import stages the whole file in one statement, in memory because of
+# temp_store=MEMORY, so larger files go through the batched Python
+# parser instead, whose memory use does not grow with the file.
+CSV_VTAB_MAX_BYTES = 32 * 1024 * 1024
+
+# Whether the write connection has the csv extension loaded. Set when
+# the pools are opened.
+_CSV_VTAB_AVAILABLE = False
+
+# Incremented after every committed write so that callers can cheaply
+# tell whether the data changed since they last looked.
+_DATA_VERSION = 0
 
-    SQLite connections are not inherently thread-safe; specifying
-    `check_same_thread=False` allows connections to be shared across
-    different threads (as used by the Telegram bot). However, ensure
-    that each thread uses its own cursor or connection where possible.
+
+def _connect() -> sqlite3.Connection:
+    """Open a new connection to the database with the pool pragmas.
+
+    `check_same_thread=False` lets the connection move between the bot's
+    worker threads as it is borrowed and returned; the pool guarantees
+    only one thread uses it at a time. `isolation_level=None` puts it in
+    autocommit mode, so writes that span several statements open their
+    own transaction.
     """
-    _ensure_db_dir()
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
 
-def init_db() -> None:
-    """Initialise the database by creating the required tables if missing."""
-    conn = get_connection()
+def _load_csv_extension(conn: sqlite3.Connection) -> bool:
+    """Try to load the csv virtual table extension into `conn`.
+
+    Python builds may lack extension loading altogether, and the
+    extension itself is not shipped with SQLite, so failure is expected
+    and simply reported as False.
+    """
     try:
+        conn.enable_load_extension(True)
+        try:
+            conn.load_extension(CSV_EXTENSION)
+        finally:
+            conn.enable_load_extension(False)
+    except (AttributeError, sqlite3.Error):
+        return False
+    return True
+
+
+def _pools() -> Tuple["queue.Queue[sqlite3.Connection]", "queue.Queue[sqlite3.Connection]"]:
+    """Return the (writer, readers) pools, opening them on first call."""
+    global _WRITER, _READERS, _CSV_VTAB_AVAILABLE
+    with _POOL_LOCK:
+        if _WRITER is None or _READERS is None:
+            _ensure_db_dir()
+            writer: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=1)
+            writer_conn = _connect()
+            # Only the writer imports files, so only it needs the extension
+            _CSV_VTAB_AVAILABLE = _load_csv_extension(writer_conn)
+            writer.put(writer_conn)
+            readers: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=POOL_SIZE - 1)
+            for _ in range(POOL_SIZE - 1):
+                readers.put(_connect())
+            _WRITER, _READERS = writer, readers
+        return _WRITER, _READERS
+
+
+@contextmanager
+def borrow(write: bool = False) -> Iterator[sqlite3.Connection]:
+    """
+    Borrow a pooled connection for the duration of the block.
+
+    Connections are kept open for the lifetime of the process so that
+    SQLite's page cache stays warm across requests. Readers block only
+    when every reader connection is in use; writers queue up for the
+    single write connection, which avoids SQLITE_BUSY between writers.
+
+    :param write: Borrow the write connection instead of a reader.
+    """
+    writer, readers = _pools()
+    pool = writer if write else readers
+    conn = pool.get()
+    try:
+        yield conn
+    finally:
+        pool.put(conn)
+
+
+def data_version() -> int:
+    """Return a counter that increases whenever a write is committed."""
+    return _DATA_VERSION
+
+
+def close() -> None:
+    """Close all pooled connections. Intended to be called on shutdown."""
+    global _WRITER, _READERS
+    with _POOL_LOCK:
+        for pool, size in ((_WRITER, 1), (_READERS, POOL_SIZE - 1)):
+            if pool is None:
+                continue
+            # Wait for borrowed connections to be returned
+            for _ in range(size):
+                pool.get().close()
+        _WRITER = _READERS = None
+
+
+@contextmanager
+def _transaction() -> Iterator[sqlite3.Cursor]:
+    """
+    Run the enclosed statements as one transaction on the write
+    connection, which stays borrowed throughout.
+
+    The connection is in autocommit mode, so the transaction is opened
+    explicitly. BEGIN IMMEDIATE takes the write lock up front rather than
+    on the first write, and a failure rolls back every statement issued
+    inside the block. A successful commit bumps the data version.
+    """
+    global _DATA_VERSION
+    with borrow(write=True) as conn:
         cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+        # Still holding the write connection, so bumps are serialised
+        _DATA_VERSION += 1
+
+
+def init_db() -> None:
+    """Initialise the database by creating the required tables if missing."""
+    with _transaction() as cursor:
         cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS sales (
@@ -63,13 +259,213 @@ def init_db() -> None:
                 date TEXT,
                 product TEXT,
                 quantity INTEGER,
-                amount REAL
+                amount REAL,
+                seq INTEGER NOT NULL DEFAULT 0
             );
             """
         )
-        conn.commit()
-    finally:
-        conn.close()
+        # Databases created before duplicate suppression lack `seq`; add
+        # it and number the existing rows as an upload would have.
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(sales)")}
+        if "seq" not in columns:
+            cursor.execute("ALTER TABLE sales ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+            cursor.execute(
+                """
+                UPDATE sales SET seq = numbered.seq
+                FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY date, product, quantity, amount ORDER BY id
+                    ) - 1 AS seq
+                    FROM sales
+                ) AS numbered
+                WHERE sales.id = numbered.id
+                """
+            )
+        cursor.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_unique
+            ON sales(date, product, quantity, amount, seq)
+            """
+        )
+        # Covering indexes: the amount column is included so that the
+        # per-date and per-product sums can be answered from the index
+        # alone, in key order, without touching the table.
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date, amount)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sales_product_amount ON sales(product, amount)"
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS daily_sales_mv (
+                date TEXT PRIMARY KEY,
+                total REAL
+            );
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS product_totals_mv (
+                product TEXT PRIMARY KEY,
+                total REAL
+            );
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS forecast_state (
+                date TEXT PRIMARY KEY,
+                level REAL
+            );
+            """
+        )
+        # Databases created before the summary tables existed already
+        # hold sales; populate the summaries from them once.
+        state_empty = cursor.execute("SELECT 1 FROM forecast_state LIMIT 1").fetchone() is None
+        has_sales = cursor.execute("SELECT 1 FROM sales LIMIT 1").fetchone() is not None
+        if state_empty and has_sales:
+            _rebuild_materialized_views(cursor)
+
+
+def _update_forecast_state(cursor: sqlite3.Cursor, since: str) -> None:
+    """
+    Recompute the smoothed level for every day from `since` onwards.
+
+    Smoothing is sequential, so a change to one day's total affects the
+    level of every later day. The recurrence restarts from the stored
+    level of the last day before `since`, which makes appending new days
+    cost proportional to the number of days touched.
+    """
+    previous = cursor.execute(
+        "SELECT level FROM forecast_state WHERE date < ? ORDER BY date DESC LIMIT 1",
+        (since,),
+    ).fetchone()
+    level = previous[0] if previous else None
+    states = []
+    for day, total in cursor.execute(
+        "SELECT date, total FROM daily_sales_mv WHERE date >= ? ORDER BY date",
+        (since,),
+    ).fetchall():
+        # The first day seeds the level with its own total
+        if level is None:
+            level = total
+        else:
+            level = SMOOTHING_ALPHA * total + (1 - SMOOTHING_ALPHA) * level
+        states.append((day, level))
+    cursor.executemany(
+        "INSERT OR REPLACE INTO forecast_state (date, level) VALUES (?, ?)",
+        states,
+    )
+
+
+def refresh_materialized_views() -> None:
+    """Rebuild the summary tables from scratch using the `sales` table."""
+    with _transaction() as cursor:
+        _rebuild_materialized_views(cursor)
+
+
+def _rebuild_materialized_views(cursor: sqlite3.Cursor) -> None:
+    """Repopulate the summary tables inside the caller's transaction."""
+    cursor.execute("DELETE FROM daily_sales_mv")
+    cursor.execute(
+        """
+        INSERT INTO daily_sales_mv (date, total)
+        SELECT date, SUM(amount) FROM sales GROUP BY date
+        """
+    )
+    cursor.execute("DELETE FROM product_totals_mv")
+    cursor.execute(
+        """
+        INSERT INTO product_totals_mv (product, total)
+        SELECT product, SUM(amount) FROM sales GROUP BY product
+        """
+    )
+    cursor.execute("DELETE FROM forecast_state")
+    _update_forecast_state(cursor, "")
+
+
+_STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS sales_staging (
+        date TEXT,
+        product TEXT,
+        quantity INTEGER,
+        amount REAL,
+        seq INTEGER
+    )
+"""
+
+
+def _apply_staging(cursor: sqlite3.Cursor) -> int:
+    """
+    Move the rows in `sales_staging` into `sales` and update the summary
+    tables to match, inside the caller's transaction.
+
+    Rows already present in `sales` are skipped, and the summary tables
+    are updated from exactly the rows that were new, so they never drift
+    when a file is uploaded again. Returns the number of inserted rows.
+    """
+    # Drop rows stored by an earlier upload (uses idx_sales_unique). IS
+    # rather than = so that rows with a missing value also match.
+    cursor.execute(
+        """
+        DELETE FROM sales_staging
+        WHERE EXISTS (
+            SELECT 1 FROM sales
+            WHERE sales.date IS sales_staging.date
+              AND sales.product IS sales_staging.product
+              AND sales.quantity IS sales_staging.quantity
+              AND sales.amount IS sales_staging.amount
+              AND sales.seq = sales_staging.seq
+        )
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales (date, product, quantity, amount, seq)
+        SELECT date, product, quantity, amount, seq FROM sales_staging
+        """
+    )
+    inserted = cursor.rowcount
+    if inserted:
+        cursor.execute(
+            """
+            INSERT INTO daily_sales_mv (date, total)
+            SELECT date, SUM(amount) FROM sales_staging GROUP BY date
+            ON CONFLICT(date) DO UPDATE SET total = total + excluded.total
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO product_totals_mv (product, total)
+            SELECT product, SUM(amount) FROM sales_staging GROUP BY product
+            ON CONFLICT(product) DO UPDATE SET total = total + excluded.total
+            """
+        )
+        since = cursor.execute("SELECT MIN(date) FROM sales_staging").fetchone()[0]
+        _update_forecast_state(cursor, since)
+        # Refresh planner statistics so the covering indexes are used
+        cursor.execute("ANALYZE")
+    cursor.execute("DELETE FROM sales_staging")
+    return inserted
+
+
+def _insert_records(records: Iterable[Tuple[str, str, int, float, int]]) -> int:
+    """
+    Insert normalised (date, product, quantity, amount, seq) tuples in
+    one transaction and update the summary tables to match.
+
+    Rows already present in `sales` are skipped. Returns the number of
+    inserted rows.
+    """
+    # One transaction per batch: rows and summary updates land together
+    with _transaction() as cursor:
+        cursor.execute(_STAGING_DDL)
+        cursor.executemany(
+            "INSERT INTO sales_staging (date, product, quantity, amount, seq) VALUES (?, ?, ?, ?, ?)",
+            records,
+        )
+        return _apply_staging(cursor)
 
 
 def insert_sales(df: pd.DataFrame) -> int:
@@ -77,37 +473,258 @@ def insert_sales(df: pd.DataFrame) -> int:
     Insert sales records from a pandas DataFrame into the database.
 
     The DataFrame must contain columns: 'date', 'product', 'quantity',
-    'amount'. Dates are parsed and normalised to ISO format
-    (YYYY-MM-DD). The function returns the number of inserted rows.
+    'amount' (case-insensitive), with 'quantity' as integer and 'amount'
+    as float. 'date' may hold datetimes or parseable date strings; either
+    is normalised to ISO format (YYYY-MM-DD). Rows stored by an earlier
+    upload of the same data are skipped. The function returns the number
+    of inserted rows.
+
+    This is a thin wrapper for callers that already hold a DataFrame;
+    uploaded files go through insert_sales_file().
 
     :param df: DataFrame with sales data
     :return: count of inserted rows
     """
-    required_cols = {"date", "product", "quantity", "amount"}
-    missing = required_cols - set(df.columns)
+    # Column names are case-insensitive, as for uploaded files. Work on a
+    # relabelled copy so that the caller's DataFrame is left untouched.
+    frame = df.set_axis(df.columns.map(lambda c: str(c).lower()), axis=1)
+    missing = set(SALES_COLUMNS).difference(frame.columns)
     if missing:
-        raise ValueError(f"Missing required columns: {missing}")
+        raise MissingColumnsError(f"Missing required columns: {missing}")
+
+    # Normalise date column to ISO format. Already-parsed datetime columns
+    # pass through to_datetime unchanged; strings are parsed with repeated
+    # values cached. strftime then formats the datetime64 values in one
+    # vectorised pass, without going through Python date objects.
+    frame["date"] = pd.to_datetime(frame["date"], format="mixed", cache=True).dt.strftime("%Y-%m-%d")
 
-    # Normalise date column to ISO format
-    # If date parsing fails, let pandas raise to inform the caller
-    df["date"] = pd.to_datetime(df["date"]).dt.date.astype(str)
-    # Ensure quantity is integer and amount is float
-    df["quantity"] = df["quantity"].astype(int)
-    df["amount"] = df["amount"].astype(float)
+    # Number repeats of an identical row so that they are kept as
+    # separate sales rather than treated as duplicates. Missing values
+    # form groups of their own instead of being dropped.
+    seq = frame.groupby(list(SALES_COLUMNS), dropna=False).cumcount()
 
-    records: List[Tuple[str, str, int, float]] = [
-        (row["date"], row["product"], int(row["quantity"]), float(row["amount"]))
-        for _, row in df.iterrows()
-    ]
+    # executemany accepts any iterable of tuples, so stream plain tuples
+    # straight from the columns instead of boxing each row into a Series.
+    return _insert_records(
+        frame[list(SALES_COLUMNS)].assign(seq=seq).itertuples(index=False, name=None)
+    )
 
-    conn = get_connection()
+
+@lru_cache(maxsize=4096)
+def _parse_date(value: str) -> str:
+    """
+    Normalise a date string to ISO format (YYYY-MM-DD).
+
+    ISO dates are handled by the standard library; anything else falls
+    back to pandas' more lenient parser. Results are cached because an
+    upload typically repeats the same few dates on many rows. Raises
+    ValueError for a value that is not a date, including a blank one.
+    """
     try:
-        cursor = conn.cursor()
-        cursor.executemany(
-            "INSERT INTO sales (date, product, quantity, amount) VALUES (?, ?, ?, ?)",
-            records,
+        return datetime.fromisoformat(value).date().isoformat()
+    except ValueError:
+        timestamp = pd.Timestamp(value)
+    # pandas turns blank and null-like strings into NaT instead of raising
+    if pd.isna(timestamp):
+        raise ValueError(f"not a date: {value!r}")
+    return timestamp.date().isoformat()
+
+
+def insert_sales_stream(fobj: BinaryIO, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Insert sales records read from a CSV file object into the database.
+
+    The file is read with the standard `csv` module rather than pandas:
+    each row is converted straight into a tuple, without building a
+    DataFrame for the whole upload. The header must contain the columns
+    'date', 'product', 'quantity', 'amount' (case-insensitive); other
+    columns are ignored. Rows are inserted in batches of `batch_size`,
+    each in its own transaction, while the following batch is parsed.
+    Rows stored by an earlier upload of the same data are skipped.
+
+    Telling a repeated upload apart from identical sales within one file
+    requires counting each distinct row seen so far, so memory grows
+    with the number of distinct rows in the file.
+
+    :param fobj: Binary file object with UTF-8 encoded CSV data, e.g. an
+                 open file or a streamed HTTP response body
+    :param batch_size: Number of rows inserted per transaction
+    :return: count of inserted rows
+    """
+    # utf-8-sig also strips the byte order mark spreadsheet tools add
+    text = io.TextIOWrapper(fobj, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, [])
+        positions = {name.strip().lower(): idx for idx, name in enumerate(header)}
+        missing = set(SALES_COLUMNS) - set(positions)
+        if missing:
+            raise MissingColumnsError(f"Missing required columns: {missing}")
+        date_idx, product_idx, quantity_idx, amount_idx = (
+            positions[column] for column in SALES_COLUMNS
         )
-        conn.commit()
-        return len(records)
+
+        # Occurrences of each distinct row so far, across all batches
+        seen: Dict[Tuple[str, str, int, float], int] = defaultdict(int)
+
+        def numbered() -> Iterator[Tuple[str, str, int, float, int]]:
+            for row in reader:
+                if not row:
+                    continue
+                key = (
+                    _parse_date(row[date_idx]),
+                    row[product_idx],
+                    int(row[quantity_idx]),
+                    float(row[amount_idx]),
+                )
+                seq = seen[key]
+                seen[key] = seq + 1
+                yield (*key, seq)
+
+        records = numbered()
+        # Insert each batch on a writer thread while the next one is read
+        # and parsed here. When `fobj` is a network stream, downloading
+        # thus overlaps with the database work. At most one batch is in
+        # flight, which keeps memory bounded and batches in order.
+        inserted = 0
+        pending: Optional["Future[int]"] = None
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            while True:
+                batch = list(islice(records, batch_size))
+                if pending is not None:
+                    inserted += pending.result()
+                if not batch:
+                    return inserted
+                pending = writer.submit(_insert_records, batch)
     finally:
-        conn.close()
\ No newline at end of file
+        # Leave the caller's file object open
+        text.detach()
+
+
+class _CsvVtabUnsuitable(Exception):
+    """Raised to abandon the csv virtual table import for a file."""
+
+
+def _stage_csv_upload(cursor: sqlite3.Cursor) -> None:
+    """
+    Copy the rows of the `temp.csv_upload` table into `sales_staging`,
+    converting them as insert_sales_stream() would.
+
+    `csv_upload` holds the raw text of a CSV file, one column per header
+    field. Only values whose conversion is unambiguous are accepted: a
+    date must start with a valid YYYY-MM-DD and carry no time zone, a
+    quantity must be a plain integer and an amount a plain decimal
+    number. Raises _CsvVtabUnsuitable if
+    the header lacks a required column or any value falls outside these
+    forms; the Python parser then decides how to treat the file.
+    """
+    # SQLite matches column names exactly, apart from ASCII case, so
+    # names padded with spaces would not resolve in the SELECT below
+    header = {row[1].lower() for row in cursor.execute("PRAGMA temp.table_info(csv_upload)")}
+    if not set(SALES_COLUMNS).issubset(header):
+        raise _CsvVtabUnsuitable()
+    cursor.execute(_STAGING_DDL)
+    # Values that fail validation become NULL and are checked below; seq
+    # numbers identical rows as insert_sales_stream() does. date() shifts
+    # a time with a zone suffix to UTC and, given a modifier, rolls an
+    # impossible day such as Feb 30 into the next month, where the Python
+    # parser keeps the local day or rejects the value; so a date is only
+    # accepted if normalising it leaves the leading YYYY-MM-DD unchanged
+    # and there is no zone, and is otherwise left to the Python parser.
+    # A quantity is
+    # valid if it survives a round trip through INTEGER unchanged; an
+    # amount, once stripped of one leading sign, must consist of digits
+    # with at most one decimal point.
+    cursor.execute(
+        """
+        INSERT INTO sales_staging (date, product, quantity, amount, seq)
+        SELECT date, product, quantity, amount,
+               ROW_NUMBER() OVER (PARTITION BY date, product, quantity, amount) - 1
+        FROM (
+            SELECT CASE WHEN raw_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+                         AND date(raw_date, '+0 days') = substr(raw_date, 1, 10)
+                         AND NOT substr(raw_date, 11) GLOB '*[Zz+-]*'
+                        THEN substr(raw_date, 1, 10) END AS date,
+                   product,
+                   CASE WHEN CAST(CAST(raw_quantity AS INTEGER) AS TEXT) = raw_quantity
+                        THEN CAST(raw_quantity AS INTEGER) END AS quantity,
+                   CASE WHEN amount_digits GLOB '*[0-9]*'
+                         AND NOT amount_digits GLOB '*[^0-9.]*'
+                         AND NOT amount_digits GLOB '*.*.*'
+                        THEN CAST(raw_amount AS REAL) END AS amount
+            FROM (
+                SELECT trim(date) AS raw_date,
+                       product,
+                       trim(quantity) AS raw_quantity,
+                       trim(amount) AS raw_amount,
+                       CASE WHEN substr(trim(amount), 1, 1) IN ('+', '-')
+                            THEN substr(trim(amount), 2)
+                            ELSE trim(amount) END AS amount_digits
+                FROM temp.csv_upload
+            )
+        )
+        """
+    )
+    invalid = cursor.execute(
+        """
+        SELECT 1 FROM sales_staging
+        WHERE date IS NULL OR quantity IS NULL OR amount IS NULL
+        LIMIT 1
+        """
+    ).fetchone()
+    if invalid:
+        raise _CsvVtabUnsuitable()
+
+
+def _insert_csv_vtab(path: str) -> int:
+    """
+    Import a CSV file through SQLite's csv virtual table.
+
+    SQLite parses the file itself and the rows go into `sales` via
+    INSERT ... SELECT, with no per-row Python work. The trade-off is
+    that the whole file is staged and sorted in one statement, in
+    memory, so insert_sales_file() only sends files of up to
+    CSV_VTAB_MAX_BYTES here. Raises
+    _CsvVtabUnsuitable, after rolling back, if the file is not in the
+    strict form _stage_csv_upload() accepts (e.g. non-ISO dates); the
+    caller then falls back to the Python parser.
+    """
+    # Virtual table arguments cannot be bound, so quote the path inline
+    filename = "'" + path.replace("'", "''") + "'"
+    with _transaction() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE temp.csv_upload USING csv(filename={filename}, header=YES)"
+        )
+        try:
+            _stage_csv_upload(cursor)
+            return _apply_staging(cursor)
+        finally:
+            cursor.execute("DROP TABLE temp.csv_upload")
+
+
+def csv_extension_available() -> bool:
+    """Return whether uploads can be imported via SQLite's csv extension."""
+    _pools()
+    return _CSV_VTAB_AVAILABLE
+
+
+def insert_sales_file(path: str) -> int:
+    """
+    Insert sales records from a CSV file on disk into the database.
+
+    When SQLite's csv extension is available the file is imported by
+    SQLite directly (see CSV_EXTENSION), which is several times faster
+    than parsing it in Python. Otherwise, when the file is larger than
+    CSV_VTAB_MAX_BYTES, or when it needs the more lenient Python parser,
+    this falls back to insert_sales_stream().
+
+    :param path: Path of the CSV file
+    :return: count of inserted rows
+    """
+    if csv_extension_available() and os.path.getsize(path) <= CSV_VTAB_MAX_BYTES:
+        try:
+            return _insert_csv_vtab(path)
+        except _CsvVtabUnsuitable:
+            pass
+    with open(path, "rb") as fobj:
+        return insert_sales_stream(fobj)
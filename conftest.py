@@ -0,0 +1,12 @@
+import pytest
+
+from analbot import data
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Point the data layer at a fresh database file for one test."""
+    data.close()
+    monkeypatch.setattr(data, "DB_PATH", str(tmp_path / "database.db"))
+    yield str(tmp_path / "database.db")
+    data.close()
@@ -0,0 +1,125 @@
+"""
+The csv extension is rarely available, so these tests stand in a plain
+temp table of TEXT columns for the virtual table that _insert_csv_vtab()
+mounts; _stage_csv_upload() reads both the same way.
+"""
+
+import io
+
+import pytest
+
+from analbot import data
+
+
+HEADER = ("date", "product", "quantity", "amount")
+VALID_ROW = ("2026-10-15", "tea", "1", "2.5")
+
+
+def _stage(rows, header=HEADER):
+    with data._transaction() as cursor:
+        columns = ", ".join(f'"{name}" TEXT' for name in header)
+        cursor.execute(f"CREATE TEMP TABLE csv_upload ({columns})")
+        placeholders = ", ".join("?" for _ in header)
+        cursor.executemany(f"INSERT INTO temp.csv_upload VALUES ({placeholders})", rows)
+        try:
+            data._stage_csv_upload(cursor)
+            return cursor.execute(
+                "SELECT date, product, quantity, amount, seq FROM sales_staging ORDER BY date, product, seq"
+            ).fetchall()
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS temp.sales_staging")
+            cursor.execute("DROP TABLE temp.csv_upload")
+
+
+def test_stage_converts_valid_rows(db):
+    data.init_db()
+    rows = [
+        (" 2026-10-15 ", "tea", " 2 ", "+2.5"),
+        ("2026-10-15", "tea", "2", "2.5"),
+        ("2026-10-15T10:00:00", "cake", "-1", ".5"),
+        ("2026-10-16", "cake", "3", "4."),
+    ]
+
+    assert _stage(rows) == [
+        ("2026-10-15", "cake", -1, 0.5, 0),
+        ("2026-10-15", "tea", 2, 2.5, 0),
+        ("2026-10-15", "tea", 2, 2.5, 1),
+        ("2026-10-16", "cake", 3, 4.0, 0),
+    ]
+
+
+@pytest.mark.parametrize("value", ["-", "+", "1.5", "", "2x", "99999999999999999999"])
+def test_stage_rejects_malformed_quantity(db, value):
+    data.init_db()
+    with pytest.raises(data._CsvVtabUnsuitable):
+        _stage([VALID_ROW, ("2026-10-15", "tea", value, "2.5")])
+
+
+@pytest.mark.parametrize("value", ["1-2", "1.2.3", "1e", "1e3", "", "-", ".", "--1", "1,5"])
+def test_stage_rejects_malformed_amount(db, value):
+    data.init_db()
+    with pytest.raises(data._CsvVtabUnsuitable):
+        _stage([VALID_ROW, ("2026-10-15", "tea", "1", value)])
+
+
+@pytest.mark.parametrize("value", [
+        "45000",
+        "10/14/2026",
+        "2026-13-01",
+        "",
+        "15.10.2026",
+        "2026-10-15T01:00:00+05:00",
+        "2026-10-15T23:00:00-05:00",
+        "2026-10-15T01:00:00Z",
+        "2026-02-30",
+        "2026-10-15T24:00:00",
+        "2026-10-15junk",
+    ])
+def test_stage_rejects_non_iso_date(db, value):
+    data.init_db()
+    with pytest.raises(data._CsvVtabUnsuitable):
+        _stage([VALID_ROW, (value, "tea", "1", "2.5")])
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        ("date", " product", "quantity", "amount"),
+        ("date", "product", "quantity"),
+        ("date", "item", "quantity", "amount"),
+    ],
+)
+def test_stage_rejects_unusable_header(db, header):
+    data.init_db()
+    with pytest.raises(data._CsvVtabUnsuitable):
+        _stage([VALID_ROW[: len(header)]], header=header)
+
+
+def test_stage_accepts_header_in_any_case(db):
+    data.init_db()
+    assert _stage([VALID_ROW], header=("Date", "PRODUCT", "Quantity", "amount")) == [
+        ("2026-10-15", "tea", 1, 2.5, 0)
+    ]
+
+
+@pytest.mark.parametrize("quantity, amount", [("-", "2.5"), ("+", "2.5"), ("1", "1-2"), ("1", "1.2.3"), ("1", "1e")])
+def test_python_parser_rejects_what_stage_rejects(db, quantity, amount):
+    data.init_db()
+    csv_file = io.BytesIO(f"date,product,quantity,amount\n2026-10-15,tea,{quantity},{amount}\n".encode())
+    with pytest.raises(ValueError):
+        data.insert_sales_stream(csv_file)
+
+
+def test_insert_sales_file_streams_large_files(db, tmp_path, monkeypatch):
+    data.init_db()
+    path = tmp_path / "sales.csv"
+    path.write_text("date,product,quantity,amount\n2026-10-15,tea,1,2.5\n")
+
+    def vtab_import(_path):
+        raise AssertionError("large file sent to the csv virtual table")
+
+    monkeypatch.setattr(data, "csv_extension_available", lambda: True)
+    monkeypatch.setattr(data, "_insert_csv_vtab", vtab_import)
+    monkeypatch.setattr(data, "CSV_VTAB_MAX_BYTES", path.stat().st_size - 1)
+
+    assert data.insert_sales_file(str(path)) == 1
@@ -0,0 +1,158 @@
+import io
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from analbot import data
+
+
+HEADER = "date,product,quantity,amount\n"
+
+
+def _csv(*rows):
+    return io.BytesIO((HEADER + "".join(f"{row}\n" for row in rows)).encode())
+
+
+def _snapshot():
+    with data.borrow() as conn:
+        return {
+            table: conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall()
+            for table in ("daily_sales_mv", "product_totals_mv", "forecast_state")
+        }
+
+
+def _assert_snapshots_equal(left, right):
+    assert left.keys() == right.keys()
+    for table in left:
+        assert [row[0] for row in left[table]] == [row[0] for row in right[table]]
+        assert [row[1] for row in left[table]] == pytest.approx(
+            [row[1] for row in right[table]]
+        )
+
+
+def test_incremental_forecast_matches_refresh(db):
+    data.init_db()
+    data.insert_sales_stream(
+        _csv("2026-10-05,tea,1,10", "2026-10-07,tea,1,30", "2026-10-09,cake,2,50"),
+        batch_size=2,
+    )
+    # Earlier days, and a day that already has sales, arrive later
+    data.insert_sales_stream(
+        _csv("2026-10-03,tea,1,5", "2026-10-07,cake,1,12", "2026-10-10,tea,1,7"),
+        batch_size=1,
+    )
+    incremental = _snapshot()
+
+    data.refresh_materialized_views()
+
+    _assert_snapshots_equal(incremental, _snapshot())
+    levels = [level for _, level in incremental["forecast_state"]]
+    expected = [5.0]
+    for total in (10.0, 42.0, 50.0, 7.0):
+        expected.append(data.SMOOTHING_ALPHA * total + (1 - data.SMOOTHING_ALPHA) * expected[-1])
+    assert levels == pytest.approx(expected)
+
+
+def test_reupload_inserts_nothing(db):
+    data.init_db()
+    rows = ("2026-10-05,tea,1,10", "2026-10-05,tea,1,10", "2026-10-06,cake,1,4")
+    assert data.insert_sales_stream(_csv(*rows)) == 3
+    before = _snapshot()
+
+    assert data.insert_sales_stream(_csv(*rows)) == 0
+    _assert_snapshots_equal(before, _snapshot())
+
+    # An overlapping file only adds the occurrences not seen before
+    assert data.insert_sales_stream(_csv(*rows, "2026-10-05,tea,1,10")) == 1
+
+
+def test_init_db_migrates_baseline_schema(db):
+    conn = sqlite3.connect(db)
+    conn.execute(
+        """
+        CREATE TABLE sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT,
+            product TEXT,
+            quantity INTEGER,
+            amount REAL
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT INTO sales (date, product, quantity, amount) VALUES (?, ?, ?, ?)",
+        [
+            ("2026-10-05", "tea", 1, 10.0),
+            ("2026-10-05", "tea", 1, 10.0),
+            ("2026-10-06", "cake", 1, 4.0),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    data.init_db()
+
+    with data.borrow() as conn:
+        assert conn.execute("SELECT id, seq FROM sales ORDER BY id").fetchall() == [
+            (1, 0),
+            (2, 1),
+            (3, 0),
+        ]
+    snapshot = _snapshot()
+    assert snapshot["daily_sales_mv"] == [("2026-10-05", 20.0), ("2026-10-06", 4.0)]
+    assert snapshot["product_totals_mv"] == [("cake", 4.0), ("tea", 20.0)]
+    assert len(snapshot["forecast_state"]) == 2
+
+    # Rows already in the migrated database count as uploaded
+    assert data.insert_sales_stream(
+        _csv("2026-10-05,tea,1,10", "2026-10-05,tea,1,10", "2026-10-06,cake,1,4")
+    ) == 0
+
+
+def test_insert_sales_keeps_rows_with_missing_values(db):
+    data.init_db()
+    df = pd.DataFrame(
+        {
+            "date": ["2026-10-05", "2026-10-05"],
+            "product": [None, None],
+            "quantity": [1, 1],
+            "amount": [2.5, 2.5],
+        }
+    )
+
+    assert data.insert_sales(df) == 2
+    assert "seq" not in df.columns
+    with data.borrow() as conn:
+        assert conn.execute("SELECT product, seq FROM sales ORDER BY seq").fetchall() == [
+            (None, 0),
+            (None, 1),
+        ]
+    # Re-inserting the same frame is recognised as a duplicate
+    assert data.insert_sales(df) == 0
+
+
+def test_insert_sales_leaves_caller_frame_untouched(db):
+    data.init_db()
+    df = pd.DataFrame(
+        {"Date": ["2026-10-05"], "PRODUCT": ["tea"], "Quantity": [1], "Amount": [2.5]}
+    )
+
+    assert data.insert_sales(df) == 1
+    assert list(df.columns) == ["Date", "PRODUCT", "Quantity", "Amount"]
+    assert df["Date"].tolist() == ["2026-10-05"]
+
+
+def test_insert_sales_rejects_unlabelled_columns(db):
+    data.init_db()
+    with pytest.raises(data.MissingColumnsError):
+        data.insert_sales(pd.DataFrame([["2026-10-05", "tea", 1, 2.5]]))
+
+
+@pytest.mark.parametrize("value", ["", "  ", "NaT", "nan"])
+def test_insert_sales_stream_rejects_blank_date(db, value):
+    data.init_db()
+    with pytest.raises(ValueError):
+        data.insert_sales_stream(_csv("2026-10-05,tea,1,100", f"{value},tea,1,99999"))
+    with data.borrow() as conn:
+        assert conn.execute("SELECT count(*) FROM sales WHERE date = 'NaT'").fetchone() == (0,)